@@ -0,0 +1,217 @@
+"""
+案例展示了 Agents-as-tools 模式。编排代理把各个专业代理（三个语言代理、天气代理、新闻代理）当作工具调用，
+当模型在一轮中同时发出多个工具调用时，这些调用会并行执行，
+因此像"北京的天气以及相关新闻，用法语回答"这样的组合请求，耗时约等于最慢的那个专业代理，而不是所有代理耗时之和。
+1. 每个工具都可以单独设置并发上限和超时时间，超时包含排队等待并发名额的时间
+2. 同一次运行内，相同工具与相同输入的成功结果会被记忆，不会重复调用子代理；失败或超时的调用可以重试
+3. 兼容Ollama模型以文本形式输出的工具调用（如 <tool_call>{...}</tool_call> 或纯JSON）
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from agents import Agent, FunctionTool, ModelSettings, OpenAIChatCompletionsModel, RunContextWrapper, Runner, \
+    function_tool
+from agents.items import ModelResponse
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage
+
+from app.agent.search_news import news_agent
+from app.agent.search_weather import agent as weather_agent
+from app.agent.translate_language import chinese_agent, english_agent, french_agent
+from app.model.model import get_model
+
+logger = logging.getLogger(__name__)
+
+# Config parameters
+CONFIG = {
+    "tool_timeout": float(os.getenv("AGENT_TOOL_TIMEOUT", "120")),
+    "tool_max_concurrency": int(os.getenv("AGENT_TOOL_MAX_CONCURRENCY", "2")),
+}
+
+# Ollama 常见的文本形式工具调用，例如 Qwen/Hermes 模板输出的 <tool_call>{...}</tool_call>
+TOOL_CALL_TAG_PATTERN = re.compile(r"(?s)<tool_call>\s*(.*?)\s*</tool_call>")
+THINK_TAG_PATTERN = re.compile(r"(?s)<think>.*?</think>")
+JSON_FENCE_PATTERN = re.compile(r"(?s)^```(?:json)?\s*(.*?)\s*```$")
+
+
+def parse_text_tool_calls(text: str) -> List[Tuple[str, str]]:
+    """
+    从模型的文本输出中解析工具调用
+
+    Args:
+        text: 模型输出的文本内容
+
+    Returns:
+        List[Tuple[str, str]]: (工具名称, JSON格式的参数) 列表；文本不是工具调用时返回空列表
+    """
+    text = THINK_TAG_PATTERN.sub("", text).strip()
+    blocks = TOOL_CALL_TAG_PATTERN.findall(text)
+    if not blocks:
+        # 部分模型（如 llama3.1）直接输出 JSON，可能包裹在 ```json 代码块中
+        fence = JSON_FENCE_PATTERN.match(text)
+        if fence:
+            text = fence.group(1)
+        if not text.startswith(("{", "[")):
+            return []
+        blocks = [text]
+
+    calls = []
+    for block in blocks:
+        try:
+            payload = json.loads(block)
+        except json.JSONDecodeError:
+            return []
+        for item in payload if isinstance(payload, list) else [payload]:
+            if not isinstance(item, dict):
+                return []
+            # 兼容 {"function": {"name": ..., "arguments": ...}} 这种OpenAI风格的嵌套结构
+            item = item.get("function", item)
+            name = item.get("name")
+            arguments = item.get("arguments", item.get("parameters"))
+            if not isinstance(name, str) or arguments is None:
+                return []
+            # Ollama 的参数可能是对象而不是JSON字符串
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments, ensure_ascii=False)
+            calls.append((name, arguments))
+    return calls
+
+
+class OllamaToolCallModel(OpenAIChatCompletionsModel):
+    """适配器模式实现: 把Ollama以文本形式输出的工具调用转换为标准的函数调用"""
+
+    async def get_response(self, *args, **kwargs) -> ModelResponse:
+        response = await super().get_response(*args, **kwargs)
+
+        output = []
+        for item in response.output:
+            if isinstance(item, ResponseFunctionToolCall):
+                # Ollama 的工具调用可能缺少 call_id，补齐后才能与工具结果对应
+                if not item.call_id:
+                    item = item.model_copy(update={"call_id": f"call_{uuid.uuid4().hex}"})
+                output.append(item)
+                continue
+            if isinstance(item, ResponseOutputMessage) and not any(
+                    isinstance(other, ResponseFunctionToolCall) for other in response.output):
+                text = "".join(getattr(part, "text", "") for part in item.content)
+                calls = parse_text_tool_calls(text)
+                if calls:
+                    logger.info(f"Converted {len(calls)} text tool call(s) from Ollama output.")
+                    output.extend(
+                        ResponseFunctionToolCall(type="function_call",
+                                                 call_id=f"call_{uuid.uuid4().hex}",
+                                                 name=name,
+                                                 arguments=arguments)
+                        for name, arguments in calls)
+                    continue
+            output.append(item)
+
+        response.output = output
+        return response
+
+
+@dataclass
+class OrchestratorContext:
+    """单次编排运行的上下文，memo 保存本次运行内各子代理调用的结果"""
+    memo: Dict[Tuple[str, str], "asyncio.Task[str]"] = field(default_factory=dict)
+
+
+def create_agent_tool(agent: Agent,
+                      tool_name: str,
+                      tool_description: str,
+                      timeout: Optional[float] = None,
+                      max_concurrency: Optional[int] = None) -> FunctionTool:
+    """
+    把专业代理包装成带并发上限、超时和记忆功能的工具
+
+    Args:
+        agent: 专业代理
+        tool_name: 工具名称
+        tool_description: 工具描述，供编排代理判断何时调用
+        timeout: 单次调用的超时秒数（包含排队时间），默认使用 CONFIG["tool_timeout"]
+        max_concurrency: 同时运行的子代理调用上限，默认使用 CONFIG["tool_max_concurrency"]
+
+    Returns:
+        FunctionTool: 可供编排代理使用的工具
+    """
+    timeout = timeout if timeout is not None else CONFIG["tool_timeout"]
+    max_concurrency = max_concurrency if max_concurrency is not None else CONFIG["tool_max_concurrency"]
+    # 信号量与事件循环绑定，按事件循环惰性创建，多次 asyncio.run 之间互不影响
+    semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+        weakref.WeakKeyDictionary()
+
+    async def run_sub_agent(input: str) -> str:
+        loop = asyncio.get_running_loop()
+        semaphore = semaphores.get(loop)
+        if semaphore is None:
+            semaphore = semaphores[loop] = asyncio.Semaphore(max_concurrency)
+        async with semaphore:
+            result = await Runner.run(agent, input)
+            return str(result.final_output)
+
+    @function_tool(name_override=tool_name, description_override=tool_description)
+    async def run_agent(ctx: RunContextWrapper[OrchestratorContext], input: str) -> str:
+        memo = ctx.context.memo
+        key = (tool_name, input.strip())
+        # 相同调用共享同一个任务，即使两次调用同时发生也只运行一次子代理
+        task = memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.wait_for(run_sub_agent(input), timeout=timeout))
+            memo[key] = task
+        else:
+            logger.info(f"Reusing memoized result for {tool_name}.")
+
+        try:
+            # 任务可能被多个调用共享，shield 保证某个调用被取消时不会连带取消共享的任务
+            return await asyncio.shield(task)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool_name} timed out after {timeout}s.")
+            error = f"{tool_name} 超时未返回结果。"
+        except Exception as e:
+            logger.exception(f"Tool {tool_name} failed.")
+            error = f"{tool_name} 调用时发生错误: {str(e)}"
+
+        # 失败的结果不做记忆，模型可以在本次运行内重试
+        if memo.get(key) is task:
+            del memo[key]
+        return error
+
+    return run_agent
+
+
+# 编排代理: 把专业代理当作工具，可在一轮中并行调用多个工具
+orchestrator_agent = Agent(
+    name="orchestrator_agent",
+    instructions="你是一个编排助手，使用提供的工具完成用户的请求。"
+                 "请求包含多个相互独立的部分时（例如同时需要天气和新闻），请在同一轮中一次性发出所有工具调用，不要逐个调用。"
+                 "用户要求用某种语言回答时，请直接用该语言撰写最终答案，不要再把工具结果交给语言工具翻译；"
+                 "只有当用户的请求本身就是翻译或语言对话时才使用语言工具。",
+    tools=[
+        create_agent_tool(french_agent, "ask_french_agent", "用法语回答或把文本翻译成法语。"),
+        create_agent_tool(chinese_agent, "ask_chinese_agent", "用中文回答或把文本翻译成中文。"),
+        create_agent_tool(english_agent, "ask_english_agent", "用英语回答或把文本翻译成英语。"),
+        create_agent_tool(weather_agent, "get_weather", "查询中国城市的实时天气和天气预报，输入应包含城市名称。"),
+        create_agent_tool(news_agent, "get_news", "使用DuckDuckGo搜索给定主题的最新新闻。"),
+    ],
+    model=get_model(os.getenv("OLLAMA_API_URL"), os.getenv("OLLAMA_API_KEY"), os.getenv("OLLAMA_MODEL_NAME"),
+                    model_class=OllamaToolCallModel),
+    model_settings=ModelSettings(temperature=float(os.getenv("OLLAMA_TEMPERATURE")),
+                                 max_tokens=int(os.getenv("OLLAMA_MAX_TOKENS")),
+                                 parallel_tool_calls=True)
+)
+
+
+async def orchestrate(request):
+    logger.info("Running orchestrator Agent workflow...")
+
+    # 每次运行使用新的上下文，记忆只在本次运行内有效
+    result = await Runner.run(orchestrator_agent, request, context=OrchestratorContext())
+
+    logger.info(result.final_output)
+    return result.final_output
@@ -0,0 +1,259 @@
+"""
+LLM-as-a-judge 模式: 生成 -> 评审 -> 修改 的有界循环。
+1. 生成Agent根据用户输入产出一个或多个候选稿
+2. 评审Agent在一次批量调用中为所有候选稿打分并给出修改意见
+3. 若最佳候选稿达到分数阈值则提前结束，否则带着评审意见进入下一轮修改
+4. 轮数受 max_iterations 限制，避免模型调用次数失控
+评审结果按内容哈希缓存，同一份稿件不会被重复评审。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from agents import Agent, Runner
+from agents.model_settings import ModelSettings
+from pydantic import BaseModel
+
+from app.model.model import get_model
+
+logger = logging.getLogger(__name__)
+
+# Config parameters
+CONFIG = {
+    "max_iterations": int(os.getenv("JUDGE_MAX_ITERATIONS", "3")),
+    "score_threshold": int(os.getenv("JUDGE_SCORE_THRESHOLD", "8")),
+    "num_candidates": int(os.getenv("JUDGE_NUM_CANDIDATES", "1")),
+    "cache_size": int(os.getenv("JUDGE_CACHE_SIZE", "256")),
+}
+
+
+# 通用评审结果，score 取值 1-10，feedback 为具体的修改意见。
+# 自定义的评审输出类型只需同样提供 score 和 feedback 字段即可接入本循环。
+class EvaluationFeedback(BaseModel):
+    score: int
+    feedback: str
+
+
+V = TypeVar("V", bound=BaseModel)
+
+
+# 批量评审的输出结构，verdicts 与候选稿一一对应且顺序一致
+class BatchVerdict(BaseModel, Generic[V]):
+    verdicts: List[V]
+
+
+@dataclass
+class JudgeLoopResult(Generic[V]):
+    output: str
+    verdict: V
+    iterations: int
+    model_calls: int
+    # 稿件是否通过验收；轮数用尽仍未通过时为False，调用方应据此决定是否继续
+    accepted: bool
+
+
+# 评审结果缓存: 内容哈希 -> 评审结果，按LRU淘汰
+_verdict_cache: "OrderedDict[str, BaseModel]" = OrderedDict()
+
+
+def create_judge_agent(name: str, instructions: str) -> Agent:
+    """
+    创建输出 EvaluationFeedback 的评审代理
+
+    Args:
+        name: 代理名称
+        instructions: 评审标准说明
+
+    Returns:
+        Agent: 配置好的评审代理实例
+    """
+    return Agent(
+        name=name,
+        instructions=f"{instructions}\n请给出1到10分的评分(score)，并给出具体、可执行的修改意见(feedback)。",
+        output_type=EvaluationFeedback,
+        model=get_model(os.getenv("OLLAMA_API_URL"), os.getenv("OLLAMA_API_KEY"), os.getenv("OLLAMA_MODEL_NAME")),
+        model_settings=ModelSettings(temperature=float(os.getenv("OLLAMA_TEMPERATURE")),
+                                     max_tokens=int(os.getenv("OLLAMA_MAX_TOKENS")))
+    )
+
+
+def _cache_key(judge_agent: Agent, content: str, reference: Optional[str]) -> str:
+    # 同一内容交给不同评审代理或对照不同参考资料时结果不同，因此键中包含代理名称和参考资料
+    key_source = f"{judge_agent.name}\n{reference or ''}\n{content}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[BaseModel]:
+    verdict = _verdict_cache.get(key)
+    if verdict is not None:
+        _verdict_cache.move_to_end(key)
+    return verdict
+
+
+def _cache_put(key: str, verdict: BaseModel) -> None:
+    _verdict_cache[key] = verdict
+    _verdict_cache.move_to_end(key)
+    while _verdict_cache and len(_verdict_cache) > CONFIG["cache_size"]:
+        _verdict_cache.popitem(last=False)
+
+
+def _judge_input(candidate: str, reference: Optional[str]) -> str:
+    if reference is None:
+        return candidate
+    return f"参考资料:\n{reference}\n\n待评审内容:\n{candidate}"
+
+
+async def judge_candidates(judge_agent: Agent,
+                           candidates: List[str],
+                           reference: Optional[str] = None) -> tuple[List[BaseModel], int]:
+    """
+    评审多个候选稿，未命中缓存的候选稿合并为一次批量调用
+
+    Args:
+        judge_agent: 评审代理，其 output_type 需包含 score 和 feedback 字段
+        candidates: 候选稿列表
+        reference: 可选的参考资料（如原始新闻），会一并交给评审代理用于核对
+
+    Returns:
+        tuple[List[BaseModel], int]: (与候选稿顺序一致的评审结果, 实际发生的模型调用次数)
+    """
+    keys = [_cache_key(judge_agent, candidate, reference) for candidate in candidates]
+
+    # 本次评审结果先收集在局部字典中，缓存只是可选的加速层，淘汰不会影响结果
+    judged: Dict[str, BaseModel] = {}
+    # 同一批次内的重复稿件只评审一次
+    pending: "OrderedDict[str, str]" = OrderedDict()
+    for key, candidate in zip(keys, candidates):
+        if key in judged or key in pending:
+            continue
+        verdict = _cache_get(key)
+        if verdict is None:
+            pending[key] = candidate
+        else:
+            judged[key] = verdict
+
+    model_calls = 0
+    if len(pending) == 1:
+        key, candidate = next(iter(pending.items()))
+        result = await Runner.run(judge_agent, _judge_input(candidate, reference))
+        judged[key] = result.final_output
+        model_calls += 1
+    elif len(pending) > 1:
+        batch_input = "\n\n".join(
+            [f"=== 候选稿 {i + 1} ===\n{candidate}" for i, candidate in enumerate(pending.values())])
+        if reference is not None:
+            batch_input = f"参考资料:\n{reference}\n\n{batch_input}"
+        batch_agent = judge_agent.clone(
+            instructions=f"{judge_agent.instructions}\n你将收到{len(pending)}份候选稿，"
+                         f"请按顺序为每一份分别给出评审结果，放入 verdicts 列表。",
+            output_type=BatchVerdict[judge_agent.output_type],
+        )
+        result = await Runner.run(batch_agent, batch_input)
+        model_calls += 1
+        batch_verdicts = result.final_output.verdicts
+        if len(batch_verdicts) == len(pending):
+            judged.update(zip(pending.keys(), batch_verdicts))
+        else:
+            # 模型返回的数量与候选稿不一致时无法对应，退回为逐个评审
+            logger.warning(f"Batch judge returned {len(batch_verdicts)} verdicts for {len(pending)} candidates, "
+                           f"falling back to individual judging.")
+            results = await asyncio.gather(
+                *[Runner.run(judge_agent, _judge_input(candidate, reference)) for candidate in pending.values()])
+            model_calls += len(results)
+            judged.update(zip(pending.keys(), [result.final_output for result in results]))
+
+    for key in pending:
+        _cache_put(key, judged[key])
+
+    return [judged[key] for key in keys], model_calls
+
+
+def _revision_prompt(input_prompt: str, draft: str, feedback: str) -> str:
+    return (f"{input_prompt}\n\n"
+            f"上一版本:\n{draft}\n\n"
+            f"评审意见:\n{feedback}\n\n"
+            f"请根据评审意见修改上一版本，只输出修改后的完整内容。")
+
+
+async def refine_with_judge(
+        generator_agent: Agent,
+        judge_agent: Agent,
+        input_prompt: str,
+        max_iterations: Optional[int] = None,
+        score_threshold: Optional[int] = None,
+        num_candidates: Optional[int] = None,
+        accept: Optional[Callable[[V], bool]] = None,
+        reference: Optional[str] = None,
+) -> JudgeLoopResult[V]:
+    """
+    运行 生成 -> 评审 -> 修改 循环，直到达到分数阈值或轮数上限
+
+    Args:
+        generator_agent: 生成代理
+        judge_agent: 评审代理，其 output_type 需包含 score 和 feedback 字段
+        input_prompt: 生成代理的原始输入
+        max_iterations: 最大轮数，默认使用 CONFIG["max_iterations"]
+        score_threshold: 提前结束的分数阈值，默认使用 CONFIG["score_threshold"]
+        num_candidates: 每轮生成的候选稿数量，默认使用 CONFIG["num_candidates"]
+        accept: 可选的额外验收条件，需与 score >= score_threshold 同时满足才算通过
+        reference: 可选的参考资料，评审时一并交给评审代理，并作为缓存键的一部分
+
+    Returns:
+        JudgeLoopResult: 通过验收的稿件；若始终未通过，则为最接近通过的稿件，及其评审结果、实际轮数和模型调用次数
+    """
+    max_iterations = max_iterations if max_iterations is not None else CONFIG["max_iterations"]
+    score_threshold = score_threshold if score_threshold is not None else CONFIG["score_threshold"]
+    num_candidates = num_candidates if num_candidates is not None else CONFIG["num_candidates"]
+
+    def is_accepted(verdict: V) -> bool:
+        # 分数阈值只在这里判断，调用方的 accept 只补充其他条件
+        return verdict.score >= score_threshold and (accept is None or accept(verdict))
+
+    def rank(verdict: V) -> tuple[bool, int]:
+        # 通过验收的稿件总是优先于未通过的稿件，其次才比较分数
+        return is_accepted(verdict), verdict.score
+
+    best_output: Optional[str] = None
+    best_verdict: Optional[V] = None
+    # 下一轮修改的基础: 上一轮中最好的候选稿，保证每轮都带着新的评审意见修改
+    draft: Optional[str] = None
+    draft_verdict: Optional[V] = None
+    model_calls = 0
+    iteration = 0
+
+    while iteration < max_iterations:
+        iteration += 1
+        if draft is None:
+            generator_input = input_prompt
+        else:
+            generator_input = _revision_prompt(input_prompt, draft, draft_verdict.feedback)
+
+        # 1. 并行生成候选稿
+        results = await asyncio.gather(
+            *[Runner.run(generator_agent, generator_input) for _ in range(num_candidates)])
+        model_calls += len(results)
+        candidates = [str(result.final_output) for result in results]
+
+        # 2. 批量评审
+        verdicts, judge_calls = await judge_candidates(judge_agent, candidates, reference)
+        model_calls += judge_calls
+
+        # 3. 选出本轮最好的候选稿，并更新整体最好的稿件
+        draft, draft_verdict = max(zip(candidates, verdicts), key=lambda pair: rank(pair[1]))
+        if best_verdict is None or rank(draft_verdict) > rank(best_verdict):
+            best_output, best_verdict = draft, draft_verdict
+
+        logger.info(f"Judge iteration {iteration}/{max_iterations}: best score {best_verdict.score}.")
+
+        if is_accepted(best_verdict):
+            break
+
+    return JudgeLoopResult(output=best_output,
+                           verdict=best_verdict,
+                           iterations=iteration,
+                           model_calls=model_calls,
+                           accepted=is_accepted(best_verdict))
@@ -6,6 +6,7 @@ from agents import Agent, Runner, function_tool
 from agents.model_settings import ModelSettings
 from duckduckgo_search import DDGS
 
+from app.agent.llm_as_a_judge import create_judge_agent, refine_with_judge
 from app.model.model import get_model
 
 logger = logging.getLogger(__name__)
@@ -50,6 +51,12 @@ editor_agent = Agent(
                                  max_tokens=int(os.getenv("OLLAMA_MAX_TOKENS")))
 )
 
+# Judge agent to review the edited news
+news_judge_agent = create_judge_agent(
+    name="News Judge",
+    instructions="You review news articles for accuracy against the source material, clarity and readiness for publishing."
+)
+
 
 # 3. Create wokflow
 async def search_news(topic):
@@ -61,11 +68,13 @@ async def search_news(topic):
     # Access the content from RunResult object
     raw_news = news_response.final_output
 
-    # Step2, pass news to editor for final review
-    edited_news_response = await Runner.run(editor_agent, raw_news)
+    # Step2, pass news to editor, then let the judge review and request revisions
+    # The raw news is passed as reference so the judge can check accuracy against it
+    edited_news_result = await refine_with_judge(editor_agent, news_judge_agent, raw_news, reference=raw_news)
+    logger.info(f"Editor finished after {edited_news_result.iterations} iterations "
+                f"with score {edited_news_result.verdict.score}.")
 
-    # Access the content from RunResult object
-    edited_news = edited_news_response.final_output
+    edited_news = edited_news_result.output
 
     logger.info("Final news articles:")
     logger.info(edited_news)
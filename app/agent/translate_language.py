@@ -1,14 +1,19 @@
 """
 案例展示了交接/路由模式。分流代理接收第一条消息，
 然后根据请求的语言将其交给适当的代理，响应会实时流式传输给用户。
+对话按会话ID保存在会话存储中，进程重启或换到其他工作进程后都可以继续之前的对话。
 """
+import asyncio
 import logging
 import os
+import uuid
+from typing import Optional
 
 from agents import OpenAIChatCompletionsModel, Agent, ModelSettings, TResponseInputItem, Runner, RawResponsesStreamEvent
 from openai.types.responses import ResponseTextDeltaEvent, ResponseContentPartDoneEvent
 
 from app.model.model import get_model
+from app.store.session_store import SessionStore
 
 logger = logging.getLogger(__name__)
 
@@ -66,51 +71,89 @@ router_agent = Agent(
 )
 
 
-async def translate_language():
+# 会话存储: 按会话ID保存当前代理和对话历史，首次使用时才创建，避免导入本模块时就打开数据库
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore(agents=[router_agent, french_agent, chinese_agent, english_agent],
+                                      default_agent=router_agent)
+    return _session_store
+
+
+async def run_turn(session_store: SessionStore, session_id: str, msg: str) -> None:
+    """
+    在指定会话中处理一条用户消息，并把响应流式输出
+
+    Args:
+        session_store: 会话存储
+        session_id: 会话ID
+        msg: 用户消息
+
+    Raises:
+        SessionConflictError: 会话在本轮处理期间已被其他工作进程更新
+    """
+    # 会话存储是同步的，放到线程中执行以免阻塞事件循环
+    session = await asyncio.to_thread(session_store.load, session_id)
+    if session is None:
+        # 新会话，初始化代理为分流代理
+        agent = router_agent
+        inputs: list[TResponseInputItem] = []
+        version = 0
+    else:
+        # 已有会话，沿用之前交接到的语言代理和对话历史
+        agent = session.agent
+        inputs = session.inputs
+        version = session.version
+    # 将用户消息添加到输入列表（用于保存完整的对话历史）
+    inputs = inputs + [{"content": msg, "role": "user"}]
+
+    # 运行当前代理
+    result = Runner.run_streamed(
+        agent,
+        input=inputs,
+    )
+
+    # 异步遍历流式事件
+    async for event in result.stream_events():
+        # 过滤出原始响应流事件
+        # 流式响应系统中会产生多种类型的事件，例如：原始响应事件（包含实际文本内容），
+        # 元数据事件（处理状态、连接信息等，系统控制事件（开始、结束、错误等）
+        if not isinstance(event, RawResponsesStreamEvent):
+            continue
+        # 模型生成的实际内容数据，主要有两种类型。
+        # 1. 文本增量事件（ResponseTextDeltaEvent）：包含实际的文本内容。
+        # 2. 内容部分完成事件（ResponseContentPartDoneEvent）：表示一个完整的响应块已经生成。
+        data = event.data
+        # 判断事件数据类型
+        # 如果是文本增量，立即打印文本片段，不换行。
+        if isinstance(data, ResponseTextDeltaEvent):
+            #  data.delta属性获取具体的文本片段
+            print(data.delta, end="", flush=True)
+        # 如果是内容部分完成，打印换行符。
+        elif isinstance(data, ResponseContentPartDoneEvent):
+            print("\n")
+
+    # 保存更新后的对话历史和当前代理（已经由分流代理交接给了语言代理）
+    await asyncio.to_thread(session_store.save, session_id, result.current_agent, result.to_input_list(), version)
+
+
+async def translate_language(session_id: Optional[str] = None):
     try:
+        # 未指定会话ID时开始一个新会话；传入之前的会话ID可以继续该会话
+        session_id = session_id or uuid.uuid4().hex
+        logger.info(f"Session ID: {session_id}")
+        session_store = get_session_store()
         msg = input("你好！我们会说法语、中文和英语。我能帮你什么忙？ ")
-        # 初始化代理为分流代理
-        agent = router_agent
-        # 创建输入列表，包含用户的第一条消息（用于保存完整的对话历史）
-        inputs: list[TResponseInputItem] = [{"content": msg, "role": "user"}]
         # 无限循环，持续处理用户的输入和代理的响应
         while True:
-            # 运行当前代理
-            result = Runner.run_streamed(
-                agent,
-                input=inputs,
-            )
-
-            # 异步遍历流式事件
-            async for event in result.stream_events():
-                # 过滤出原始响应流事件
-                # 流式响应系统中会产生多种类型的事件，例如：原始响应事件（包含实际文本内容），
-                # 元数据事件（处理状态、连接信息等，系统控制事件（开始、结束、错误等）
-                if not isinstance(event, RawResponsesStreamEvent):
-                    continue
-                # 模型生成的实际内容数据，主要有两种类型。
-                # 1. 文本增量事件（ResponseTextDeltaEvent）：包含实际的文本内容。
-                # 2. 内容部分完成事件（ResponseContentPartDoneEvent）：表示一个完整的响应块已经生成。
-                data = event.data
-                # 判断事件数据类型
-                # 如果是文本增量，立即打印文本片段，不换行。
-                if isinstance(data, ResponseTextDeltaEvent):
-                    #  data.delta属性获取具体的文本片段
-                    print(data.delta, end="", flush=True)
-                # 如果是内容部分完成，打印换行符。
-                elif isinstance(data, ResponseContentPartDoneEvent):
-                    print("\n")
-
-            # 获取更新后的对话历史
-            inputs = result.to_input_list()
+            await run_turn(session_store, session_id, msg)
             logger.info("\n")
 
             # 获取用户的下一条消息
-            user_msg = input("Enter a message: ")
-            # 将用户消息添加到输入列表
-            inputs.append({"content": user_msg, "role": "user"})
-            # 更新当前代理为结果中的代理（已经由分流代理交接给了语言代理）
-            agent = result.current_agent
+            msg = input("Enter a message: ")
 
     # 异常处理
     except KeyboardInterrupt:
@@ -7,6 +7,7 @@ from pathlib import Path
 from agents import Agent, Runner, function_tool, ModelSettings, trace
 from pydantic import BaseModel
 
+from app.agent.llm_as_a_judge import refine_with_judge
 from app.model.model import get_model
 
 logger = logging.getLogger(__name__)
@@ -15,8 +16,8 @@ logger = logging.getLogger(__name__)
 此示例演示了一个确定性流程，其中每个步骤由一个Agent执行。
 1. 第一个Agent生成故事大纲
 2. 我们将大纲提供给第二个Agent
-3. 第二个Agent检查大纲是否质量良好，以及是否是科幻故事
-4. 如果大纲质量不佳或不是科幻故事，我们就此停止
+3. 第二个Agent检查大纲是否质量良好，以及是否是科幻故事，并给出评分和修改意见
+4. 未通过检查时第一个Agent根据意见修改大纲，最多重复若干轮；最终仍不合格则就此停止
 5. 如果大纲质量良好且是科幻故事，我们将大纲提供给第三个Agent
 6. 第三个Agent撰写故事
 7. 将最终的故事保存到本地文件
@@ -40,15 +41,19 @@ story_outline_agent = Agent(
 
 # Define the outline to check the output structure.
 # Use Pydantic model to ensure the consistency and type safety of the output format.
+# score and feedback let the checker drive the judge refinement loop.
 class OutlineChecker(BaseModel):
     good_quality: bool
     is_scifi: bool
+    score: int
+    feedback: str
 
 
 # Agent2: Create the outline checker agent
 outline_checker_agent = Agent(
     name="outline_checker_agent",
-    instructions="阅读给定的故事大纲，并判断其质量。同时，确定它是否是一个科幻故事。",
+    instructions="阅读给定的故事大纲，并判断其质量。同时，确定它是否是一个科幻故事。"
+                 "请给出1到10分的评分(score)，并给出具体、可执行的修改意见(feedback)。",
     output_type=OutlineChecker,
     model=get_model(os.getenv("OLLAMA_API_URL"), os.getenv("OLLAMA_API_KEY"), os.getenv("OLLAMA_MODEL_NAME")),
     model_settings=ModelSettings(temperature=float(os.getenv("OLLAMA_TEMPERATURE")),
@@ -109,31 +114,28 @@ async def write_story():
 
         # 确保整个工作流是单个跟踪
         with trace("确定性故事流程"):
-            print("正在生成故事大纲...")
-            # 1. 生成大纲
-            outline_result = await Runner.run(
+            print("正在生成并检查故事大纲...")
+            # 1. 生成大纲，2. 检查大纲，未通过时根据评审意见修改，轮数有上限
+            outline_loop = await refine_with_judge(
                 story_outline_agent,
-                input_prompt,
-            )
-            print(f"已生成大纲:\n{outline_result.final_output}\n")
-
-            # 2. 检查大纲
-            print("正在检查大纲质量...")
-            outline_checker_result = await Runner.run(
                 outline_checker_agent,
-                outline_result.final_output,
+                input_prompt,
+                accept=lambda verdict: verdict.good_quality and verdict.is_scifi,
             )
-
-            # 3. 添加一个门控，如果大纲质量不佳或不是科幻故事则停止
-            assert isinstance(outline_checker_result.final_output, OutlineChecker)
-            result = outline_checker_result.final_output
-
-            if not result.good_quality:
-                print("大纲质量不佳，到此为止。")
-                return
-
-            if not result.is_scifi:
-                print("大纲不是科幻故事，到此为止。")
+            print(f"已生成大纲:\n{outline_loop.output}\n")
+            print(f"大纲经过{outline_loop.iterations}轮评审，评分: {outline_loop.verdict.score}")
+
+            # 3. 添加一个门控，与评审循环使用同一验收结果，大纲未通过则停止
+            assert isinstance(outline_loop.verdict, OutlineChecker)
+            result = outline_loop.verdict
+
+            if not outline_loop.accepted:
+                if not result.good_quality:
+                    print("大纲质量不佳，到此为止。")
+                elif not result.is_scifi:
+                    print("大纲不是科幻故事，到此为止。")
+                else:
+                    print(f"大纲评分{result.score}未达到要求，到此为止。")
                 return
 
             print("大纲质量良好且是科幻故事，因此我们继续撰写故事。")
@@ -142,7 +144,7 @@ async def write_story():
             print("正在撰写故事...")
             story_result = await Runner.run(
                 story_agent,
-                outline_result.final_output,
+                outline_loop.output,
             )
 
             # 故事初始版本
@@ -9,6 +9,7 @@ setup_logging()
 # from app.agent.search_news import search_news
 # from app.agent.search_weather import search_weather
 # from app.agent.plan_meal import plan_meal
+# from app.agent.agents_as_tool_ollama import orchestrate
 from app.agent.translate_language import translate_language
 
 if __name__ == '__main__':
@@ -16,4 +17,5 @@ if __name__ == '__main__':
     # asyncio.run(search_news("美国轰炸伊朗"))
     # asyncio.run(search_weather("北京"))
     # asyncio.run(write_story())
+    # asyncio.run(orchestrate("北京的天气以及相关新闻，用法语回答"))
     asyncio.run(translate_language())
@@ -7,7 +7,7 @@ from agents.model_settings import ModelSettings
 from agents import set_default_openai_client, set_tracing_disabled
 logger = logging.getLogger(__name__)
 
-def get_model(api_url, api_key, model_name):
+def get_model(api_url, api_key, model_name, model_class=OpenAIChatCompletionsModel):
     logger.info(f"The api url is {api_url}.")
     logger.info(f"The api key is {api_key}.")
     logger.info(f"The model name is {model_name}.")
@@ -20,7 +20,7 @@ def get_model(api_url, api_key, model_name):
         # timeout=query_timeout
     )
 
-    model = OpenAIChatCompletionsModel(
+    model = model_class(
         model=model_name,
         openai_client=external_client,
     )
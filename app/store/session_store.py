@@ -0,0 +1,217 @@
+"""
+多会话对话存储，按会话ID保存当前代理和对话历史（输入项列表）。
+1. 热层: 内存中的LRU缓存，最多保留 max_hot_sessions 个会话，超过上限或空闲超时的会话被移出内存
+2. 冷层: SQLite 数据库，对话历史以压缩后的JSON保存，每次保存都会写入，因此任何工作进程都能恢复会话
+3. 读取时若内存中没有或数据库中的版本更新，则从数据库惰性恢复
+4. 保存时按版本号做比较并交换，多个工作进程同时处理同一会话时，后写入者会收到 SessionConflictError 而不是覆盖对方
+无论会话总数有多少，内存占用都是有界的。
+存储的方法都是同步且线程安全的，在异步代码中请通过 asyncio.to_thread 调用，避免阻塞事件循环。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from agents import Agent, TResponseInputItem
+
+logger = logging.getLogger(__name__)
+
+SESSION_DB_FILE = os.path.join(os.path.dirname(__file__), "../data/sessions.db")
+
+# Config parameters
+CONFIG = {
+    "db_path": os.getenv("SESSION_DB_PATH", SESSION_DB_FILE),
+    "max_hot_sessions": int(os.getenv("SESSION_MAX_HOT_SESSIONS", "128")),
+    "idle_seconds": float(os.getenv("SESSION_IDLE_SECONDS", "600")),
+}
+
+
+class SessionConflictError(Exception):
+    """会话在读取之后已被其他工作进程更新"""
+
+
+@dataclass
+class Session:
+    agent: Agent
+    inputs: List[TResponseInputItem]
+    # 数据库中的版本号，用于判断其他工作进程是否已经更新了该会话
+    version: int = 0
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class SessionStore:
+    """内存LRU热层 + SQLite冷层的会话存储"""
+
+    def __init__(self,
+                 agents: Iterable[Agent],
+                 default_agent: Agent,
+                 db_path: Optional[str] = None,
+                 max_hot_sessions: Optional[int] = None,
+                 idle_seconds: Optional[float] = None):
+        """
+        Args:
+            agents: 会话中可能出现的代理，恢复会话时按名称查找
+            default_agent: 会话中保存的代理已不存在（如部署之间改了名称）时，恢复会话所使用的代理
+            db_path: SQLite数据库文件路径，默认使用 CONFIG["db_path"]
+            max_hot_sessions: 内存中最多保留的会话数，默认使用 CONFIG["max_hot_sessions"]
+            idle_seconds: 会话空闲多久后移出内存，默认使用 CONFIG["idle_seconds"]
+        """
+        self.agents: Dict[str, Agent] = {agent.name: agent for agent in agents}
+        self.agents.setdefault(default_agent.name, default_agent)
+        self.default_agent = default_agent
+        self.max_hot_sessions = max_hot_sessions if max_hot_sessions is not None else CONFIG["max_hot_sessions"]
+        self.idle_seconds = idle_seconds if idle_seconds is not None else CONFIG["idle_seconds"]
+        self._hot: "OrderedDict[str, Session]" = OrderedDict()
+
+        # 方法会在 asyncio.to_thread 的线程池中执行，连接和热层由锁保护
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path if db_path is not None else CONFIG["db_path"], check_same_thread=False)
+        # WAL 模式允许多个工作进程同时读写同一个数据库文件
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, "
+            "agent_name TEXT NOT NULL, "
+            "inputs BLOB NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id: str) -> Optional[Session]:
+        """
+        读取会话，必要时从数据库惰性恢复
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Optional[Session]: 会话；不存在时返回None
+        """
+        with self._lock:
+            self.evict_idle()
+
+            row = self._conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                self._hot.pop(session_id, None)
+                return None
+
+            session = self._hot.get(session_id)
+            if session is None or session.version != row[0]:
+                session = self._rehydrate(session_id)
+                if session is None:
+                    self._hot.pop(session_id, None)
+                    return None
+
+            session.last_access = time.monotonic()
+            self._hot[session_id] = session
+            self._hot.move_to_end(session_id)
+            self._evict_overflow()
+            return session
+
+    def save(self,
+             session_id: str,
+             agent: Agent,
+             inputs: List[TResponseInputItem],
+             expected_version: int = 0) -> Session:
+        """
+        保存会话，同时写入热层和数据库
+
+        Args:
+            session_id: 会话ID
+            agent: 当前代理
+            inputs: 完整的对话历史
+            expected_version: 读取会话时的版本号，新会话为0
+
+        Returns:
+            Session: 保存后的会话
+
+        Raises:
+            SessionConflictError: 会话在读取之后已被其他工作进程更新
+        """
+        if agent.name not in self.agents:
+            raise ValueError(f"Unknown agent '{agent.name}', register it when creating the SessionStore.")
+
+        payload = zlib.compress(json.dumps(inputs, ensure_ascii=False).encode("utf-8"))
+        version = expected_version + 1
+        with self._lock:
+            try:
+                with self._conn:
+                    if expected_version == 0:
+                        self._conn.execute(
+                            "INSERT INTO sessions (session_id, agent_name, inputs, version, updated_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (session_id, agent.name, payload, version, time.time()),
+                        )
+                    else:
+                        cursor = self._conn.execute(
+                            "UPDATE sessions SET agent_name = ?, inputs = ?, version = ?, updated_at = ? "
+                            "WHERE session_id = ? AND version = ?",
+                            (agent.name, payload, version, time.time(), session_id, expected_version),
+                        )
+                        if cursor.rowcount == 0:
+                            raise SessionConflictError(f"Session {session_id} was modified by another worker.")
+            except sqlite3.IntegrityError:
+                raise SessionConflictError(f"Session {session_id} was created by another worker.")
+            except SessionConflictError:
+                # 丢弃热层中的旧版本，下次读取时从数据库恢复最新版本
+                self._hot.pop(session_id, None)
+                raise
+
+            session = Session(agent=agent, inputs=inputs, version=version)
+            self._hot[session_id] = session
+            self._hot.move_to_end(session_id)
+            self._evict_overflow()
+            return session
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._hot.pop(session_id, None)
+            with self._conn:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def evict_idle(self) -> None:
+        """把空闲超时的会话移出内存，数据库中的数据保留"""
+        deadline = time.monotonic() - self.idle_seconds
+        with self._lock:
+            # 热层按访问时间排序，最久未访问的在最前面
+            while self._hot:
+                session_id, session = next(iter(self._hot.items()))
+                if session.last_access > deadline:
+                    break
+                self._hot.popitem(last=False)
+                logger.debug(f"Evicted idle session {session_id} from memory.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._hot.clear()
+            self._conn.close()
+
+    def _evict_overflow(self) -> None:
+        while len(self._hot) > self.max_hot_sessions:
+            session_id, _ = self._hot.popitem(last=False)
+            logger.debug(f"Evicted session {session_id} from memory, hot tier is full.")
+
+    def _rehydrate(self, session_id: str) -> Optional[Session]:
+        row = self._conn.execute("SELECT agent_name, inputs, version FROM sessions WHERE session_id = ?",
+                                 (session_id,)).fetchone()
+        if row is None:
+            return None
+
+        agent_name, payload, version = row
+        agent = self.agents.get(agent_name)
+        if agent is None:
+            # 保留对话历史和版本号，下次保存仍是基于该版本的更新，而不是与已有记录冲突的新建
+            logger.warning(f"Session {session_id} refers to unknown agent '{agent_name}', "
+                           f"resuming it with {self.default_agent.name}.")
+            agent = self.default_agent
+
+        inputs = json.loads(zlib.decompress(payload).decode("utf-8"))
+        logger.info(f"Rehydrated session {session_id} from disk.")
+        return Session(agent=agent, inputs=inputs, version=version)